@@ -474,6 +474,7 @@ def parse_args(input_args=None):
         help=(
             "The dtype of the VAE model. Choose between ['default', 'fp16', 'fp32', 'bf16']."
             " The default VAE dtype is bfloat16, due to NaN issues in SDXL 1.0."
+            " Selecting 'default' uses bfloat16 on Ampere or newer GPUs, and fp32 on older GPUs without bf16 support."
             " Using fp16 is not recommended."
         ),
     )
@@ -486,6 +487,25 @@ def parse_args(input_args=None):
             " but if you are at that point of contention, it's possible that your GPU has too little RAM. Default: 4."
         ),
     )
+    parser.add_argument(
+        "--vae_enable_slicing",
+        action="store_true",
+        default=False,
+        help=(
+            "If set, the VAE will encode and decode one sample of a batch at a time."
+            " This lowers peak VRAM use during VAE caching without changing the resulting latents."
+        ),
+    )
+    parser.add_argument(
+        "--vae_enable_tiling",
+        action="store_true",
+        default=False,
+        help=(
+            "If set, the VAE will process large images in overlapping spatial tiles. This greatly reduces the"
+            " activation memory of the VAE, allowing a larger --vae_batch_size, but tiles are blended at their seams,"
+            " so latents for images larger than the VAE's tile size will differ slightly from an untiled encode."
+        ),
+    )
     parser.add_argument(
         "--vae_cache_scan_behaviour",
         type=str,
@@ -1354,12 +1374,13 @@ def parse_args(input_args=None):
     parser.add_argument(
         "--validation_noise_scheduler",
         type=str,
-        choices=["ddim", "ddpm", "euler", "euler-a", "unipc"],
+        choices=["ddim", "ddpm", "euler", "euler-a", "unipc", "dpm++"],
         default=None,
         help=(
             "When validating the model at inference time, a different scheduler may be chosen."
             " UniPC can offer better speed, and Euler A can put up with instabilities a bit better."
-            " For zero-terminal SNR models, DDIM is the best choice. Choices: ['ddim', 'ddpm', 'euler', 'euler-a', 'unipc'],"
+            " DPM++ 2M Karras ('dpm++') reaches good quality in 15-20 steps, allowing a lower --validation_num_inference_steps."
+            " For zero-terminal SNR models, DDIM is the best choice. Choices: ['ddim', 'ddpm', 'euler', 'euler-a', 'unipc', 'dpm++'],"
             " Default: None (use the model default)"
         ),
     )
@@ -15,7 +15,9 @@ from helpers.metadata.backends.base import MetadataBackend
 from helpers.training.state_tracker import StateTracker
 from helpers.training.multi_process import _get_rank as get_rank
 from helpers.training.multi_process import rank_info
+from helpers.training.wrappers import enable_vae_memory_options
 from queue import Queue
+from collections import deque
 from concurrent.futures import as_completed
 from hashlib import sha256
 
@@ -101,7 +103,8 @@ class VAECache:
         self.process_queue_size = process_queue_size
         self.vae_batch_size = vae_batch_size
         self.instance_data_dir = instance_data_dir
-        self.transform = MultiaspectImage.get_image_transforms()
+        # Pixels stay uint8 until encode_images has moved them onto the accelerator.
+        self.transform = MultiaspectImage.get_uint8_image_transforms()
         self.rank_info = rank_info()
         self.metadata_backend = metadata_backend
         if not self.metadata_backend.image_metadata_loaded:
@@ -123,6 +126,14 @@ class VAECache:
         self.process_queue = Queue()
         self.write_queue = Queue()
         self.vae_input_queue = Queue()
+        # Populated by build_vae_cache_filename_map; see _vae_cache_path.
+        self.image_path_to_vae_path = {}
+        self.vae_path_to_image_path = {}
+        # Latent writes are handed to a background pool so that the next batch can be encoded
+        # while the previous one is still uploading. We cap the in-flight batches to bound memory.
+        self.write_pool = ThreadPoolExecutor(max_workers=8)
+        self.pending_writes = deque()
+        self.max_pending_writes = 4
 
     def debug_log(self, msg: str):
         logger.debug(f"{self.rank_info}{msg}")
@@ -174,9 +185,20 @@ class VAECache:
             self.image_path_to_vae_path[image_file] = cache_filename
             self.vae_path_to_image_path[cache_filename] = image_file
 
+    def _vae_cache_path(self, filepath: str) -> str:
+        """Get the cache path for an image, from the prebuilt map where possible."""
+        cache_path = self.image_path_to_vae_path.get(filepath)
+        if cache_path is None:
+            cache_path = self.generate_vae_cache_filename(filepath)[0]
+        return cache_path
+
     def already_cached(self, filepath: str) -> bool:
+        """
+        Check the in-memory VAE cache listing rather than probing the backend,
+        which would be one HEAD request per image on S3.
+        """
         test_path = self.image_path_to_vae_path.get(filepath, None)
-        if self.cache_data_backend.exists(test_path):
+        if test_path in StateTracker.get_vae_cache_files(data_backend_id=self.id):
             return True
         return False
 
@@ -261,12 +283,17 @@ class VAECache:
             else args.pretrained_vae_model_name_or_path
         )
         precached_vae = StateTracker.get_vae()
-        self.vae = precached_vae or AutoencoderKL.from_pretrained(
-            vae_path,
-            subfolder="vae" if args.pretrained_vae_model_name_or_path is None else None,
-            revision=args.revision,
-            force_upcast=False,
-        ).to(self.accelerator.device)
+        self.vae = precached_vae or enable_vae_memory_options(
+            AutoencoderKL.from_pretrained(
+                vae_path,
+                subfolder=(
+                    "vae" if args.pretrained_vae_model_name_or_path is None else None
+                ),
+                revision=args.revision,
+                force_upcast=False,
+            ).to(self.accelerator.device, dtype=StateTracker.get_vae_dtype()),
+            args,
+        )
         StateTracker.set_vae(self.vae)
 
     def rebuild_cache(self):
@@ -341,29 +368,24 @@ class VAECache:
 
     def _list_cached_images(self):
         """
-        Return a set of filenames (without the .pt extension) that have been processed.
+        Return the cache filenames that have been processed, as a dict keyed by the full .pt path.
+
+        This is the listing StateTracker already holds, rather than a second set of stripped
+        filenames, which would double the memory held for millions of cache entries.
         """
-        # Extract array of tuple into just, an array of files:
-        pt_files = StateTracker.get_vae_cache_files(data_backend_id=self.id)
-        # Extract just the base filename without the extension
-        results = {os.path.splitext(f)[0] for f in pt_files}
-        # self.debug_log(
-        #     f"Found {len(pt_files)} cached files in {self.cache_dir} (truncated): {list(results)[:5]}"
-        # )
-        return results
+        return StateTracker.get_vae_cache_files(data_backend_id=self.id)
 
     def discover_unprocessed_files(self, directory: str = None):
         """Identify files that haven't been processed yet."""
         all_image_files = StateTracker.get_image_files(data_backend_id=self.id)
-        existing_cache_files = set(
-            StateTracker.get_vae_cache_files(data_backend_id=self.id)
-        )
-        # Convert cache filenames to their corresponding image filenames
-        already_cached_images = []
+        existing_cache_files = StateTracker.get_vae_cache_files(data_backend_id=self.id)
+        # Convert cache filenames to their corresponding image filenames.
+        # This is a set, so that the filtering below is a single O(1) lookup per image.
+        already_cached_images = set()
         for cache_file in existing_cache_files:
             try:
                 n = self._image_filename_from_vaecache_filename(cache_file)
-                already_cached_images.append(n)
+                already_cached_images.add(n)
                 # print(f"Mapping: {n} -> {cache_file}")
             except Exception as e:
                 logger.error(
@@ -384,24 +406,27 @@ class VAECache:
         aspect_bucket_cache: dict,
         processed_images: dict,
         do_shuffle: bool = True,
+        local_unprocessed_files: set = None,
     ):
         """
         Given a bucket, return the relevant files for that bucket.
         """
+        if local_unprocessed_files is None:
+            local_unprocessed_files = set(self.local_unprocessed_files)
         relevant_files = []
         total_files = 0
         skipped_files = 0
         for full_image_path in aspect_bucket_cache[bucket]:
             total_files += 1
-            comparison_path = self.generate_vae_cache_filename(full_image_path)[0]
-            if os.path.splitext(comparison_path)[0] in processed_images:
-                # processed_images contains basename *cache* paths:
+            comparison_path = self._vae_cache_path(full_image_path)
+            if comparison_path in processed_images:
+                # processed_images contains full *cache* paths:
                 skipped_files += 1
                 # self.debug_log(
                 #     f"Reduce bucket {bucket}, skipping ({skipped_files}/{total_files}) {full_image_path} because it is in processed_images"
                 # )
                 continue
-            if full_image_path not in self.local_unprocessed_files:
+            if full_image_path not in local_unprocessed_files:
                 # full_image_path is the full *image* path:
                 skipped_files += 1
                 # self.debug_log(
@@ -413,7 +438,9 @@ class VAECache:
             # )
             relevant_files.append(full_image_path)
         if do_shuffle:
-            shuffle(relevant_files)
+            # Keep files from the same directory (or S3 prefix) together so reads stay local,
+            # while still visiting them in a pseudo-random order within each directory.
+            relevant_files.sort(key=lambda p: (os.path.dirname(p), hash(p) & 0xFFFF))
         # self.debug_log(
         #     f"Reduced bucket {bucket} down from {len(aspect_bucket_cache[bucket])} to {len(relevant_files)} relevant files."
         #     f" Our system has {len(self.local_unprocessed_files)} total images in its assigned slice for processing across all buckets."
@@ -431,28 +458,31 @@ class VAECache:
         if batch_size != len(filepaths):
             raise ValueError("Mismatch between number of images and filepaths.")
 
-        full_filenames = [
-            self.generate_vae_cache_filename(filepath)[0] for filepath in filepaths
-        ]
+        full_filenames = [self._vae_cache_path(filepath) for filepath in filepaths]
 
         # Check cache for each image and filter out already cached ones
         uncached_images = []
-        uncached_image_indices = [
-            i
-            for i, filename in enumerate(full_filenames)
-            if not self.cache_data_backend.exists(filename)
-        ]
-        uncached_image_paths = [
-            filepaths[i]
-            for i, filename in enumerate(full_filenames)
-            if i in uncached_image_indices
-        ]
+        if load_from_cache and not self.vae_cache_ondemand:
+            # Every entry should already be cached, so we read them directly instead of
+            # probing the backend first. A missing entry surfaces when it is read, below.
+            uncached_image_indices = []
+        elif load_from_cache:
+            uncached_image_indices = [
+                i
+                for i, filename in enumerate(full_filenames)
+                if not self.cache_data_backend.exists(filename)
+            ]
+        else:
+            # The caller has already filtered these against the cache listing.
+            uncached_image_indices = list(range(batch_size))
+        uncached_index_set = set(uncached_image_indices)
+        uncached_image_paths = [filepaths[i] for i in uncached_image_indices]
 
         # We need to populate any uncached images with the actual image data if they are None.
         missing_images = [
             i
             for i, image in enumerate(images)
-            if i in uncached_image_indices and image is None
+            if i in uncached_index_set and image is None
         ]
         missing_image_pixel_values = []
         written_latents = []
@@ -461,11 +491,11 @@ class VAECache:
             missing_image_data_generator = self._read_from_storage_concurrently(
                 missing_image_paths, hide_errors=True
             )
-            # extract images from generator:
-            missing_image_data = [
-                retrieved_image_data[1]
-                for retrieved_image_data in missing_image_data_generator
-            ]
+            # The generator yields in completion order, so rebuild the path list alongside the data.
+            missing_image_paths, missing_image_data = [], []
+            for path, image_data in missing_image_data_generator:
+                missing_image_paths.append(path)
+                missing_image_data.append(image_data)
             missing_image_pixel_values = self._process_images_in_batch(
                 missing_image_paths, missing_image_data, disable_queue=True
             )
@@ -473,6 +503,17 @@ class VAECache:
                 image_pixel_values=missing_image_pixel_values, disable_queue=True
             )
             written_latents = self._write_latents_in_batch(missing_image_vae_outputs)
+            latents_by_filepath = {
+                filepath: latent_vector
+                for (_, filepath, _), latent_vector in zip(
+                    missing_image_vae_outputs, written_latents
+                )
+            }
+            written_latents = [
+                latents_by_filepath[filepath]
+                for filepath in filepaths
+                if filepath in latents_by_filepath
+            ]
             if len(written_latents) == len(images):
                 return written_latents
 
@@ -499,19 +540,36 @@ class VAECache:
         latents = []
         if load_from_cache:
             # If all images are cached, simply load them
-            latents = [
-                self._read_from_storage(filename, hide_errors=self.vae_cache_ondemand)
-                for filename in full_filenames
-                if filename not in uncached_images
-            ]
+            try:
+                latents = [
+                    self._read_from_storage(
+                        filename, hide_errors=self.vae_cache_ondemand
+                    )
+                    for filename in full_filenames
+                    if filename not in uncached_images
+                ]
+            except FileNotFoundError as e:
+                raise Exception(
+                    f"(id={self.id}) Some images were not correctly cached during the VAE Cache operations. Ensure --skip_file_discovery=vae is not set.\nProblematic images: {e}"
+                )
 
         if len(uncached_images) > 0 and (
             len(images) != len(latents) or len(filepaths) != len(latents)
         ):
             # Process images not found in cache
-            with torch.no_grad():
-                processed_images = torch.stack(uncached_images).to(
-                    self.accelerator.device, dtype=StateTracker.get_vae_dtype()
+            with torch.inference_mode():
+                processed_images = torch.stack(uncached_images)
+                if processed_images.device.type == "cpu" and torch.cuda.is_available():
+                    # Stage the batch in pinned memory so it crosses to the GPU in a single async copy.
+                    processed_images = processed_images.pin_memory()
+                processed_images = processed_images.to(
+                    self.accelerator.device, non_blocking=True
+                )
+                if processed_images.dtype == torch.uint8:
+                    # Normalise to [-1, 1] on the device, matching MultiaspectImage.get_image_transforms().
+                    processed_images = processed_images.float().div_(127.5).sub_(1.0)
+                processed_images = processed_images.to(
+                    dtype=StateTracker.get_vae_dtype()
                 )
                 latents_uncached = self.vae.encode(
                     processed_images
@@ -521,17 +579,21 @@ class VAECache:
                     and hasattr(self.vae.config, "shift_factor")
                     and self.vae.config.shift_factor is not None
                 ):
-                    latents_uncached = (
-                        latents_uncached - self.vae.config.shift_factor
-                    ) * self.vae.config.scaling_factor
+                    latents_uncached.sub_(self.vae.config.shift_factor).mul_(
+                        self.vae.config.scaling_factor
+                    )
                 else:
-                    latents_uncached = latents_uncached * self.vae.config.scaling_factor
+                    latents_uncached.mul_(self.vae.config.scaling_factor)
                 logger.debug(f"Latents shape: {latents_uncached.shape}")
 
+            if not latents and len(uncached_image_indices) == batch_size:
+                # Nothing came from the cache, so the encoded batch is already in order.
+                return list(latents_uncached.unbind(0))
+
             # Prepare final latents list by combining cached and newly computed latents
             cached_idx, uncached_idx = 0, 0
             for i in range(batch_size):
-                if i in uncached_image_indices:
+                if i in uncached_index_set:
                     latents.append(latents_uncached[uncached_idx])
                     uncached_idx += 1
                 else:
@@ -540,6 +602,12 @@ class VAECache:
         return latents
 
     def _write_latents_in_batch(self, input_latents: list = None):
+        """
+        Hand a batch of latents to the background write pool, and return their CPU copies.
+
+        The batch is not waited on here. Only earlier batches beyond max_pending_writes are
+        collected, so in on-demand mode a failed write is raised by a later, unrelated batch.
+        """
         # Pull the 'filepaths' and 'latents' from self.write_queue
         filepaths, latents = [], []
         if input_latents is not None:
@@ -549,7 +617,7 @@ class VAECache:
 
         for idx in range(0, qlen):
             if input_latents:
-                output_file, filepath, latent_vector = input_latents.pop()
+                output_file, filepath, latent_vector = input_latents[idx]
             else:
                 output_file, filepath, latent_vector = self.write_queue.get()
             file_extension = os.path.splitext(output_file)[1]
@@ -558,13 +626,50 @@ class VAECache:
                     f"Cannot write a latent embedding to an image path, {output_file}"
                 )
             filepaths.append(output_file)
-            # pytorch will hold onto all of the tensors in the list if we do not use clone()
-            latents.append(latent_vector.clone())
+            # pytorch will hold onto all of the tensors in the list if we do not copy them.
+            # Copying to the CPU here also frees the batch from the accelerator right away.
+            latents.append(latent_vector.to("cpu", copy=True))
 
-        self.cache_data_backend.write_batch(filepaths, latents)
+        self.pending_writes.append(
+            self.write_pool.submit(
+                self.cache_data_backend.write_batch, filepaths, latents
+            )
+        )
+        # During training, on-demand latents must not silently fail to persist.
+        self.wait_for_pending_writes(
+            max_pending=self.max_pending_writes, raise_errors=self.vae_cache_ondemand
+        )
 
         return latents
 
+    def wait_for_pending_writes(self, max_pending: int = 0, raise_errors: bool = False):
+        """
+        Block until no more than `max_pending` latent write batches are in flight.
+
+        Call with the default of 0 to flush every outstanding write, eg. before listing the cache.
+        Write failures are logged, or re-raised when `raise_errors` is set.
+        """
+        while self.pending_writes and (
+            len(self.pending_writes) > max_pending or self.pending_writes[0].done()
+        ):
+            future = self.pending_writes.popleft()
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Error writing latents to the VAE cache: {e}")
+                self.debug_log(f"Error traceback: {traceback.format_exc()}")
+                if raise_errors:
+                    raise e
+
+    def close(self):
+        """
+        Flush every outstanding latent write and shut down the write pool.
+
+        Failures are only logged: at teardown, a lost cache entry is cheaper than losing the run.
+        """
+        self.wait_for_pending_writes()
+        self.write_pool.shutdown(wait=True)
+
     def _process_images_in_batch(
         self,
         image_paths: list = None,
@@ -627,13 +732,17 @@ class VAECache:
                     for data in initial_data
                 ]
                 first_aspect_ratio = None
-                for future in futures:
+                # Samples that fail to prepare are dropped, so track which input each result belongs to.
+                processed_inputs = []
+                for data, future in zip(initial_data, futures):
+                    filepath = data[0]
                     try:
                         result = (
                             future.result()
                         )  # Returns PreparedSample or tuple(image, crop_coordinates, aspect_ratio)
                         if result:  # Ensure result is not None or invalid
                             processed_images.append(result)
+                            processed_inputs.append(data)
                             if first_aspect_ratio is None:
                                 first_aspect_ratio = result[2]
                             elif (
@@ -674,12 +783,11 @@ class VAECache:
                 elif new_aspect_ratio != first_aspect_ratio:
                     is_final_sample = True
                     first_aspect_ratio = new_aspect_ratio
-                filepath, _, aspect_bucket = initial_data[idx]
+                filepath, _, aspect_bucket = processed_inputs[idx]
                 filepaths.append(filepath)
 
-                pixel_values = self.transform(image).to(
-                    self.accelerator.device, dtype=self.vae.dtype
-                )
+                # Samples stay on the CPU; encode_images moves the stacked batch over in one copy.
+                pixel_values = self.transform(image)
                 output_value = (pixel_values, filepath, aspect_bucket, is_final_sample)
                 output_values.append(output_value)
                 if not disable_queue:
@@ -724,10 +832,11 @@ class VAECache:
         try:
             if image_pixel_values is not None:
                 qlen = len(image_pixel_values)
-                if self.vae_batch_size != len(image_pixel_values):
-                    self.vae_batch_size = len(image_pixel_values)
+                # Encode an explicit batch in one go, without resizing self.vae_batch_size for the queue.
+                vae_batch_size = qlen
             else:
                 qlen = self.vae_input_queue.qsize()
+                vae_batch_size = self.vae_batch_size
 
             if qlen == 0:
                 return
@@ -735,7 +844,7 @@ class VAECache:
             while qlen > 0:
                 vae_input_images, vae_input_filepaths, vae_output_filepaths = [], [], []
                 batch_aspect_bucket = None
-                count_to_process = min(qlen, self.vae_batch_size)
+                count_to_process = min(qlen, vae_batch_size)
                 for idx in range(0, count_to_process):
                     if image_pixel_values:
                         pixel_values, filepath, aspect_bucket, is_final_sample = (
@@ -750,19 +859,14 @@ class VAECache:
                         batch_aspect_bucket = aspect_bucket
                     vae_input_images.append(pixel_values)
                     vae_input_filepaths.append(filepath)
-                    vae_output_filepaths.append(
-                        self.generate_vae_cache_filename(filepath)[0]
-                    )
+                    vae_output_filepaths.append(self._vae_cache_path(filepath))
                     if is_final_sample:
                         # When we have fewer samples in a bucket than our VAE batch size might indicate,
                         # we need to respect is_final_sample value and not retrieve the *next* element yet.
                         break
 
                 latents = self.encode_images(
-                    [
-                        sample.to(dtype=StateTracker.get_vae_dtype())
-                        for sample in vae_input_images
-                    ],
+                    vae_input_images,
                     vae_input_filepaths,
                     load_from_cache=False,
                 )
@@ -810,8 +914,6 @@ class VAECache:
             try:
                 return path, self._read_from_storage(path, hide_errors=hide_errors)
             except Exception as e:
-                import traceback
-
                 logger.error(
                     f"Error reading {path}: {e}, traceback: {traceback.format_exc()}"
                 )
@@ -895,23 +997,73 @@ class VAECache:
                 completed_futures.append(future)
         return [f for f in futures if f not in completed_futures]
 
+    def _reap_futures(self, futures: list):
+        """Collect any completed futures, without waiting on the ones still running."""
+        pending_futures = []
+        for future in futures:
+            if not future.done():
+                pending_futures.append(future)
+                continue
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(
+                    f"An error occurred in a future: {e}, future traceback {traceback.format_exc()}"
+                )
+        return pending_futures
+
+    def _submit_stage(
+        self,
+        executor: ThreadPoolExecutor,
+        futures: list,
+        stage_futures: dict,
+        stage: str,
+        fn,
+    ):
+        """
+        Submit a pipeline stage, unless the previous batch for that stage is still running.
+
+        Each stage drains its queue from a qsize() snapshot, so only one worker may consume
+        a given queue at a time. Different stages are free to overlap, which lets reads and
+        image preprocessing run while the VAE is encoding the previous batch.
+        """
+        running = stage_futures.get(stage)
+        if running is not None and not running.done():
+            return
+        stage_futures[stage] = executor.submit(fn)
+        futures.append(stage_futures[stage])
+
+    def _pipeline_is_backlogged(self):
+        """Whether the decoded-image queues have run far enough ahead of the VAE."""
+        return (
+            self.process_queue.qsize() >= self.process_queue_size * 4
+            or self.vae_input_queue.qsize() >= self.vae_batch_size * 4
+        )
+
     def process_buckets(self):
         futures = []
+        stage_futures = {}
         processed_images = self._list_cached_images()
         aspect_bucket_cache = self.metadata_backend.read_cache().copy()
+        # Membership checks against the local slice happen once per image, so use a set.
+        local_unprocessed_files = set(self.local_unprocessed_files)
 
         # Extract and shuffle the keys of the dictionary
         do_shuffle = (
             os.environ.get("SIMPLETUNER_SHUFFLE_ASPECTS", "true").lower() == "true"
         )
+        shuffled_keys = list(aspect_bucket_cache.keys())
         if do_shuffle:
-            shuffled_keys = list(aspect_bucket_cache.keys())
             shuffle(shuffled_keys)
 
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             for bucket in shuffled_keys:
                 relevant_files = self._reduce_bucket(
-                    bucket, aspect_bucket_cache, processed_images, do_shuffle
+                    bucket,
+                    aspect_bucket_cache,
+                    processed_images,
+                    do_shuffle,
+                    local_unprocessed_files,
                 )
                 if len(relevant_files) == 0:
                     continue
@@ -933,7 +1085,7 @@ class VAECache:
                     test_filepath = self._image_filename_from_vaecache_filename(
                         filepath
                     )
-                    if test_filepath not in self.local_unprocessed_files:
+                    if test_filepath not in local_unprocessed_files:
                         statistics["not_local"] += 1
                         continue
                     try:
@@ -948,30 +1100,44 @@ class VAECache:
                         # We will check to see whether the queue is ready.
                         if self.read_queue.qsize() >= self.read_batch_size:
                             # We have an adequate number of samples to read. Let's now do that in a batch, to reduce I/O wait.
-                            future_to_read = executor.submit(self.read_images_in_batch)
-                            futures.append(future_to_read)
+                            self._submit_stage(
+                                executor,
+                                futures,
+                                stage_futures,
+                                "read",
+                                self.read_images_in_batch,
+                            )
 
                         # Now we try and process the images, if we have a process batch size large enough.
                         if self.process_queue.qsize() >= self.process_queue_size:
-                            future_to_process = executor.submit(
-                                self._process_images_in_batch
+                            self._submit_stage(
+                                executor,
+                                futures,
+                                stage_futures,
+                                "process",
+                                self._process_images_in_batch,
                             )
-                            futures.append(future_to_process)
 
                         # Now we encode the images.
                         if self.vae_input_queue.qsize() >= self.vae_batch_size:
                             statistics["cached"] += 1
-                            future_to_process = executor.submit(
-                                self._encode_images_in_batch
+                            self._submit_stage(
+                                executor,
+                                futures,
+                                stage_futures,
+                                "encode",
+                                self._encode_images_in_batch,
                             )
-                            futures.append(future_to_process)
 
                         # If we have accumulated enough write objects, we can write them to disk at once.
                         if self.write_queue.qsize() >= self.write_batch_size:
-                            future_to_write = executor.submit(
-                                self._write_latents_in_batch
+                            self._submit_stage(
+                                executor,
+                                futures,
+                                stage_futures,
+                                "write",
+                                self._write_latents_in_batch,
                             )
-                            futures.append(future_to_write)
                     except ValueError as e:
                         logger.error(f"Received fatal error: {e}")
                         raise e
@@ -980,12 +1146,17 @@ class VAECache:
                         self.debug_log(f"Error traceback: {traceback.format_exc()}")
                         raise e
 
-                    # Now, see if we have any futures to complete, and execute them.
-                    # Cleanly removes futures from the list, once they are completed.
-                    futures = self._process_futures(futures, executor)
+                    # Collect whichever stages have finished, leaving the rest running in the background.
+                    # If decoded images are piling up faster than the VAE can consume them, wait instead.
+                    if self._pipeline_is_backlogged():
+                        futures = self._process_futures(futures, executor)
+                    else:
+                        futures = self._reap_futures(futures)
 
                 try:
-                    # Handle remainders after processing the bucket
+                    # Handle remainders after processing the bucket.
+                    # Stages from the loop above may still be draining their queues, so let them finish first.
+                    futures = self._process_futures(futures, executor)
                     if self.read_queue.qsize() > 0:
                         # We have an adequate number of samples to read. Let's now do that in a batch, to reduce I/O wait.
                         future_to_read = executor.submit(self.read_images_in_batch)
@@ -1028,6 +1199,7 @@ class VAECache:
                 except Exception as e:
                     logger.error(f"Fatal error when processing bucket {bucket}: {e}")
                     continue
+        self.wait_for_pending_writes()
 
     def scan_cache_contents(self):
         """
@@ -142,10 +142,11 @@ class S3DataBackend(BaseDataBackend):
     def write(self, s3_key, data):
         """Upload data to the specified S3 key."""
         real_key = str(s3_key)
+        if type(data) == Tensor:
+            # torch_save serialises the tensor and calls back into write() with the bytes.
+            return self.torch_save(data, real_key)
         for i in range(self.write_retry_limit):
             try:
-                if type(data) == Tensor:
-                    return self.torch_save(data, real_key)
                 response = self.client.put_object(
                     Body=data,
                     Bucket=self.bucket_name,
@@ -216,8 +217,12 @@ class S3DataBackend(BaseDataBackend):
             f"Listing files in S3 bucket {self.bucket_name} in prefix {instance_data_dir} with search pattern: {pattern}"
         )
 
-        # Paginating over the entire bucket objects
-        for page in paginator.paginate(Bucket=self.bucket_name, MaxKeys=1000):
+        # Only keys beginning with instance_data_dir can match the pattern, so we let S3
+        # filter on that prefix instead of paginating over every object in the bucket.
+        paginate_args = {"Bucket": self.bucket_name, "MaxKeys": 1000}
+        if instance_data_dir and not any(c in instance_data_dir for c in "*?["):
+            paginate_args["Prefix"] = instance_data_dir
+        for page in paginator.paginate(**paginate_args):
             # logger.debug(f"Page: {page}")
             for obj in page.get("Contents", []):
                 # Filter based on the provided pattern
@@ -335,25 +340,18 @@ class S3DataBackend(BaseDataBackend):
         import torch
         from io import BytesIO
 
-        # Retry the torch save within the retry limit
-        for i in range(self.write_retry_limit):
-            try:
-                buffer = BytesIO()
-                if self.compress_cache:
-                    data = self._compress_torch(data)
-                torch.save(data, buffer)
-                logger.debug(f"Writing torch file: {s3_key}")
-                result = self.write(s3_key, buffer.getvalue())
-                logger.debug(f"Write completed: {s3_key}")
-                return result
-            except Exception as e:
-                logger.error(f"Could not torch save to backend: {e}")
-                if i == self.write_retry_limit - 1:
-                    # We have reached our maximum retry count.
-                    raise e
-                else:
-                    # Sleep for a bit before retrying.
-                    time.sleep(self.write_retry_interval)
+        # Serialise once, on the calling (writer) thread. Upload retries are handled by write(),
+        # so a failed upload doesn't re-pickle the tensor, or re-compress already compressed data.
+        if self.compress_cache:
+            payload = self._compress_torch(data)
+        else:
+            buffer = BytesIO()
+            torch.save(data, buffer)
+            payload = buffer.getvalue()
+        logger.debug(f"Writing torch file: {s3_key}")
+        result = self.write(s3_key, payload)
+        logger.debug(f"Write completed: {s3_key}")
+        return result
 
     def write_batch(self, s3_keys, data_list):
         """Write a batch of files to the specified S3 keys concurrently."""
@@ -3,12 +3,17 @@ import multiprocessing
 import numpy as np
 from PIL import Image
 
+LUMINANCE_WEIGHTS = np.array([0.299, 0.587, 0.114])
+
 
 def calculate_luminance(img: Image.Image):
-    np_img = np.asarray(img.convert("RGB"))
-    r, g, b = np_img[:, :, 0], np_img[:, :, 1], np_img[:, :, 2]
-    luminance = 0.299 * r + 0.587 * g + 0.114 * b
-    avg_luminance = np.mean(luminance)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    np_img = np.asarray(img)
+    # Luminance is linear in the channels, so the mean luminance is the weighted sum of the channel means.
+    # Reducing the uint8 pixels directly avoids building several full-size float64 copies of the image.
+    channel_means = np_img.reshape(-1, 3).mean(axis=0)
+    avg_luminance = np.dot(channel_means, LUMINANCE_WEIGHTS)
     return avg_luminance
 
 
@@ -20,6 +20,16 @@ class MultiaspectImage:
             ]
         )
 
+    @staticmethod
+    def get_uint8_image_transforms():
+        """
+        Convert a PIL image into a uint8 tensor, leaving normalisation for later.
+
+        This keeps host memory and host-to-device copies at a quarter of the size of
+        float32 pixels. The values are normalised to [-1, 1] once they are on the GPU.
+        """
+        return transforms.PILToTensor()
+
     @staticmethod
     def _round_to_nearest_multiple(value):
         """Round a value to the nearest multiple."""
@@ -1,9 +1,10 @@
 import torch
 import os
+import inspect
 import wandb
 import logging
 from tqdm import tqdm
-from helpers.training.wrappers import unwrap_model
+from helpers.training.wrappers import unwrap_model, enable_vae_memory_options
 from PIL import Image
 from helpers.training.state_tracker import StateTracker
 from helpers.sdxl.pipeline import (
@@ -16,6 +17,7 @@ from diffusers.schedulers import (
     EulerAncestralDiscreteScheduler,
     FlowMatchEulerDiscreteScheduler,
     UniPCMultistepScheduler,
+    DPMSolverMultistepScheduler,
     DDIMScheduler,
     DDPMScheduler,
 )
@@ -42,9 +44,15 @@ SCHEDULER_NAME_MAP = {
     "euler-a": EulerAncestralDiscreteScheduler,
     "flow-match": FlowMatchEulerDiscreteScheduler,
     "unipc": UniPCMultistepScheduler,
+    "dpm++": DPMSolverMultistepScheduler,
     "ddim": DDIMScheduler,
     "ddpm": DDPMScheduler,
 }
+# Additional scheduler config needed to turn a base class into the named sampler.
+SCHEDULER_EXTRA_ARGS = {
+    # DPM-Solver++ 2M with Karras sigmas, which converges in roughly 15-20 steps.
+    "dpm++": {"algorithm_type": "dpmsolver++", "use_karras_sigmas": True},
+}
 
 import logging
 import os
@@ -164,47 +172,44 @@ def prepare_validation_prompt_list(args, embed_cache):
         validation_sample_images = retrieve_validation_images()
         if len(validation_sample_images) > 0:
             StateTracker.set_validation_sample_images(validation_sample_images)
-            # Collect the prompts for the validation images.
-            for _validation_sample in tqdm(
-                validation_sample_images,
-                ncols=100,
-                desc="Precomputing validation image embeds",
-            ):
-                _, validation_prompt, _ = _validation_sample
-                embed_cache.compute_embeddings_for_prompts(
-                    [validation_prompt], load_from_cache=False
-                )
+            # Collect the prompts for the validation images, and encode them in one batched call.
+            # The embeds are only written to the cache, so they aren't concatenated and returned.
+            logger.info("Precomputing validation image embeds.")
+            embed_cache.compute_embeddings_for_prompts(
+                [
+                    validation_prompt
+                    for _, validation_prompt, _ in validation_sample_images
+                ],
+                return_concat=False,
+                load_from_cache=False,
+            )
             time.sleep(5)
 
     if args.validation_prompt_library:
         # Use the SimpleTuner prompts library for validation prompts.
         from helpers.prompts import prompts as prompt_library
 
-        # Iterate through the prompts with a progress bar
-        for shortname, prompt in tqdm(
-            prompt_library.items(),
-            leave=False,
-            ncols=100,
-            desc="Precomputing validation prompt embeddings",
-        ):
-            embed_cache.compute_embeddings_for_prompts(
-                [prompt], is_validation=True, load_from_cache=False
-            )
-            validation_prompts.append(prompt)
-            validation_shortnames.append(shortname)
+        logger.info("Precomputing validation prompt embeddings.")
+        embed_cache.compute_embeddings_for_prompts(
+            list(prompt_library.values()),
+            return_concat=False,
+            is_validation=True,
+            load_from_cache=False,
+        )
+        validation_prompts.extend(prompt_library.values())
+        validation_shortnames.extend(prompt_library.keys())
     if args.user_prompt_library is not None:
         user_prompt_library = PromptHandler.load_user_prompts(args.user_prompt_library)
-        for shortname, prompt in tqdm(
-            user_prompt_library.items(),
-            leave=False,
-            ncols=100,
-            desc="Precomputing user prompt library embeddings",
-        ):
+        if len(user_prompt_library) > 0:
+            logger.info("Precomputing user prompt library embeddings.")
             embed_cache.compute_embeddings_for_prompts(
-                [prompt], is_validation=True, load_from_cache=False
+                list(user_prompt_library.values()),
+                return_concat=False,
+                is_validation=True,
+                load_from_cache=False,
             )
-            validation_prompts.append(prompt)
-            validation_shortnames.append(shortname)
+        validation_prompts.extend(user_prompt_library.values())
+        validation_shortnames.extend(user_prompt_library.keys())
     if args.validation_prompt is not None:
         # Use a single prompt for validation.
         # This will add a single prompt to the prompt library, if in use.
@@ -484,12 +489,17 @@ class Validation:
         logger.debug(
             f"Was the VAE loaded? {precached_vae if precached_vae is None else 'Yes'}"
         )
-        self.vae = precached_vae or AutoencoderKL.from_pretrained(
-            vae_path,
-            subfolder="vae" if args.pretrained_vae_model_name_or_path is None else None,
-            revision=args.revision,
-            force_upcast=False,
-        ).to(self.accelerator.device)
+        self.vae = precached_vae or enable_vae_memory_options(
+            AutoencoderKL.from_pretrained(
+                vae_path,
+                subfolder=(
+                    "vae" if args.pretrained_vae_model_name_or_path is None else None
+                ),
+                revision=args.revision,
+                force_upcast=False,
+            ).to(self.accelerator.device, dtype=StateTracker.get_vae_dtype()),
+            args,
+        )
         StateTracker.set_vae(self.vae)
 
         return self.vae
@@ -834,6 +844,10 @@ class Validation:
         skip_execution: bool = False,
     ):
         self._update_state()
+        if validation_type == "final":
+            # Drop any pipeline kept from earlier validations, so that neither the final
+            # validation nor the model export that follows it shares memory with a stale copy.
+            self.clean_pipeline()
         should_validate = self.should_perform_validation(
             step, self.validation_prompts, validation_type
         ) or (step == 0 and validation_type == "base_model")
@@ -865,10 +879,22 @@ class Validation:
             self.process_prompts()
             self.finalize_validation(validation_type)
             logger.debug("Validation process completed.")
-            self.clean_pipeline()
+            if not self._should_reuse_pipeline(validation_type):
+                self.clean_pipeline()
 
         return self
 
+    def _should_reuse_pipeline(self, validation_type):
+        """
+        Whether the pipeline can be kept for the next validation run.
+
+        The pipeline wraps the live training modules, so it does not need rebuilding between
+        validations. Keeping it avoids reloading the other components from disk and, with
+        --validation_torch_compile, recompiling the model every time. The final validation
+        swaps in the trained text encoders, so run_validations discards any kept pipeline first.
+        """
+        return validation_type != "final"
+
     def should_perform_validation(self, step, validation_prompts, validation_type):
         should_do_intermediary_validation = (
             validation_prompts
@@ -903,6 +929,9 @@ class Validation:
             scheduler_args["variance_type"] = variance_type
         if self.deepfloyd:
             self.args.validation_noise_scheduler = "ddpm"
+        scheduler_args.update(
+            SCHEDULER_EXTRA_ARGS.get(self.args.validation_noise_scheduler, {})
+        )
         scheduler = SCHEDULER_NAME_MAP[
             self.args.validation_noise_scheduler
         ].from_pretrained(
@@ -1015,6 +1044,17 @@ class Validation:
                     self.accelerator.device
                 )
 
+            # Prompts are embedded by the prompt handler, not the pipeline. Any text encoder we did not
+            # hand over above would otherwise be loaded from disk and moved onto the accelerator.
+            pipeline_parameters = inspect.signature(pipeline_cls.__init__).parameters
+            for text_encoder_name in (
+                "text_encoder",
+                "text_encoder_2",
+                "text_encoder_3",
+            ):
+                if text_encoder_name in pipeline_parameters:
+                    extra_pipeline_kwargs.setdefault(text_encoder_name, None)
+
             pipeline_kwargs = {
                 "pretrained_model_name_or_path": self.args.pretrained_model_name_or_path,
                 "revision": self.args.revision,
@@ -1045,6 +1085,8 @@ class Validation:
                     logger.error(e)
                     logger.error(traceback.format_exc())
                     continue
+                break
+            if self.pipeline is None:
                 return None
             if self.args.validation_torch_compile:
                 if self.unet is not None and not is_compiled_module(self.unet):
@@ -1138,7 +1180,17 @@ class Validation:
         """Generate validation images for a single prompt."""
         # Placeholder for actual image generation and logging
         logger.debug(f"Validating prompt: {prompt}")
-        validation_images = {}
+        validation_images = {validation_shortname: []}
+        # The embeds only depend on the prompt, so we gather them once and reuse them for every resolution.
+        try:
+            prompt_embed_kwargs = self._gather_prompt_embeds(prompt)
+        except Exception as e:
+            import traceback
+
+            logger.error(
+                f"Error gathering text embed for validation prompt {prompt}: {e}, traceback: {traceback.format_exc()}"
+            )
+            return validation_images
         for resolution in self.validation_resolutions:
             extra_validation_kwargs = {}
             if not self.args.validation_randomize:
@@ -1187,17 +1239,7 @@ class Validation:
             logger.debug(
                 f"Processing width/height: {validation_resolution_width}x{validation_resolution_height}"
             )
-            if validation_shortname not in validation_images:
-                validation_images[validation_shortname] = []
-            try:
-                extra_validation_kwargs.update(self._gather_prompt_embeds(prompt))
-            except Exception as e:
-                import traceback
-
-                logger.error(
-                    f"Error gathering text embed for validation prompt {prompt}: {e}, traceback: {traceback.format_exc()}"
-                )
-                continue
+            extra_validation_kwargs.update(prompt_embed_kwargs)
 
             try:
                 pipeline_kwargs = {
@@ -1337,8 +1379,17 @@ class Validation:
                     "Skipping EMA model restoration for validation, as enable_ema_model=False."
                 )
         if not self.args.keep_vae_loaded and not self.args.vae_cache_ondemand:
-            self.vae = self.vae.to("cpu")
+            # A reused pipeline keeps its VAE after self.vae is released, so offload that one
+            # instead; setup_pipeline moves it back onto the accelerator for the next run.
+            vae = (
+                self.vae
+                if self.vae is not None
+                else getattr(self.pipeline, "vae", None)
+            )
+            if vae is not None:
+                vae.to("cpu")
             self.vae = None
-        self.pipeline = None
+        if not self._should_reuse_pipeline(validation_type):
+            self.pipeline = None
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
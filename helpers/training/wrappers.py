@@ -5,3 +5,12 @@ def unwrap_model(accelerator, model):
     model = accelerator.unwrap_model(model)
     model = model._orig_mod if is_compiled_module(model) else model
     return model
+
+
+def enable_vae_memory_options(vae, args):
+    """Apply --vae_enable_slicing and --vae_enable_tiling to a freshly loaded VAE."""
+    if args.vae_enable_slicing:
+        vae.enable_slicing()
+    if args.vae_enable_tiling:
+        vae.enable_tiling()
+    return vae
@@ -0,0 +1,33 @@
+import unittest
+import numpy as np
+from PIL import Image
+from helpers.image_manipulation.brightness import calculate_luminance
+
+
+def per_pixel_luminance(img: Image.Image):
+    """The original implementation: average the luminance of every pixel."""
+    np_img = np.asarray(img.convert("RGB"))
+    r, g, b = np_img[:, :, 0], np_img[:, :, 1], np_img[:, :, 2]
+    return np.mean(0.299 * r + 0.587 * g + 0.114 * b)
+
+
+class TestCalculateLuminance(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.pixels = rng.integers(0, 256, size=(37, 53, 4), dtype=np.uint8)
+
+    def test_matches_per_pixel_mean(self):
+        images = {
+            "RGB": Image.fromarray(self.pixels[:, :, :3], mode="RGB"),
+            "L": Image.fromarray(self.pixels[:, :, 0], mode="L"),
+            "RGBA": Image.fromarray(self.pixels, mode="RGBA"),
+        }
+        for mode, img in images.items():
+            with self.subTest(mode=mode):
+                self.assertAlmostEqual(
+                    calculate_luminance(img), per_pixel_luminance(img), places=6
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,7 @@ from unittest.mock import patch
 from unittest.mock import Mock, MagicMock
 from PIL import Image
 from io import BytesIO
+import torch
 from helpers.multiaspect.image import MultiaspectImage
 from helpers.training.state_tracker import StateTracker
 from tests.helpers.data import MockDataBackend
@@ -375,6 +376,16 @@ class TestMultiaspectImage(unittest.TestCase):
                     f"Failed for original size {W}x{H}",
                 )
 
+    def test_uint8_image_transforms_match_normalised_transforms(self):
+        """
+        Test that uint8 pixels normalised on-device match the float32 transform.
+        """
+        uint8_pixels = MultiaspectImage.get_uint8_image_transforms()(self.test_image)
+        self.assertEqual(uint8_pixels.dtype, torch.uint8)
+        normalised = uint8_pixels.float().div_(127.5).sub_(1.0)
+        expected = MultiaspectImage.get_image_transforms()(self.test_image)
+        self.assertTrue(torch.allclose(normalised, expected, atol=1e-6))
+
 
 if __name__ == "__main__":
     unittest.main()
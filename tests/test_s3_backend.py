@@ -0,0 +1,107 @@
+import unittest
+from io import BytesIO
+from unittest.mock import Mock, patch
+import torch
+from helpers.data_backend.aws import S3DataBackend
+
+
+class FakeS3Client:
+    """A minimal in-memory stand-in for the boto3 S3 client."""
+
+    class exceptions:
+        NoSuchKey = type("NoSuchKey", (Exception,), {})
+
+    def __init__(self):
+        self.objects = {}
+        self.paginate_calls = []
+        self.put_object = Mock(side_effect=self._put_object)
+
+    def _put_object(self, Body, Bucket, Key):
+        self.objects[Key] = Body
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self.exceptions.NoSuchKey(Key)
+        return {"Body": BytesIO(self.objects[Key])}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise Exception("Not Found")
+
+    def get_paginator(self, operation_name):
+        return FakePaginator(self)
+
+
+class FakePaginator:
+    """Serves list_objects_v2 from the fake client in a single page, honouring Prefix."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, **kwargs):
+        self.client.paginate_calls.append(kwargs)
+        prefix = kwargs.get("Prefix", "")
+        yield {
+            "Contents": [
+                {"Key": key}
+                for key in sorted(self.client.objects)
+                if key.startswith(prefix)
+            ]
+        }
+
+
+class TestS3DataBackend(unittest.TestCase):
+    def _backend(self, client, **kwargs):
+        with patch("helpers.data_backend.aws.boto3.client", return_value=client):
+            return S3DataBackend(
+                id="foo",
+                bucket_name="bucket",
+                accelerator=Mock(),
+                write_retry_limit=3,
+                write_retry_interval=0,
+                **kwargs,
+            )
+
+    def test_torch_save_round_trip(self):
+        tensor = torch.arange(12, dtype=torch.float32).reshape(3, 4)
+        for compress_cache in (False, True):
+            with self.subTest(compress_cache=compress_cache):
+                backend = self._backend(FakeS3Client(), compress_cache=compress_cache)
+                backend.torch_save(tensor, "cache/sample.pt")
+                self.assertTrue(
+                    torch.equal(backend.torch_load("cache/sample.pt"), tensor)
+                )
+
+    def test_failed_upload_is_retried_write_retry_limit_times(self):
+        client = FakeS3Client()
+        client.put_object = Mock(side_effect=Exception("Simulated upload failure"))
+        backend = self._backend(client)
+        with self.assertRaises(Exception):
+            backend.torch_save(torch.zeros(2), "cache/sample.pt")
+        self.assertEqual(client.put_object.call_count, backend.write_retry_limit)
+
+    def test_list_files_restricts_listing_to_prefix(self):
+        client = FakeS3Client()
+        for key in ("data/a.png", "data/sub/b.png", "data/c.pt", "other/d.png"):
+            client.objects[key] = b""
+        backend = self._backend(client)
+
+        def listed_files(instance_data_dir):
+            return sorted(
+                path
+                for _, _, files in backend.list_files(
+                    str_pattern="*.png", instance_data_dir=instance_data_dir
+                )
+                for path in files
+            )
+
+        expected = ["data/a.png", "data/sub/b.png"]
+        self.assertEqual(listed_files("data"), expected)
+        self.assertEqual(client.paginate_calls[-1].get("Prefix"), "data")
+        # A glob in the directory can't be used as a literal prefix, so the whole bucket is listed.
+        self.assertEqual(listed_files("d[a]ta"), expected)
+        self.assertNotIn("Prefix", client.paginate_calls[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
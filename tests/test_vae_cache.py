@@ -0,0 +1,210 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock, MagicMock, patch
+from PIL import Image
+import torch
+from helpers.caching.vae import VAECache
+from helpers.training.state_tracker import StateTracker
+from tests.helpers.data import MockDataBackend
+
+
+class PassthroughVAE:
+    """Returns its (normalised) input as the latent, so each latent identifies its source image."""
+
+    config = SimpleNamespace(scaling_factor=1.0, shift_factor=None)
+
+    def encode(self, pixel_values):
+        return SimpleNamespace(
+            latent_dist=SimpleNamespace(sample=lambda: pixel_values.clone())
+        )
+
+
+class TestVAECacheBatchAlignment(unittest.TestCase):
+    def setUp(self):
+        # Each image is a solid grey whose level identifies it.
+        self.levels = {"/data/a.png": 10, "/data/b.png": 20, "/data/c.png": 30}
+        self.images = {
+            path: Image.new("RGB", (8, 8), color=(level, level, level))
+            for path, level in self.levels.items()
+        }
+        self.data_backend = MockDataBackend()
+        self.data_backend.id = "foo"
+        self.data_backend.type = "local"
+        self.data_backend.create_directory = Mock()
+        self.data_backend.exists = Mock(return_value=False)
+        self.data_backend.write_batch = Mock()
+        self.metadata_backend = MagicMock()
+        self.metadata_backend.image_metadata_loaded = True
+        self.accelerator = Mock(device="cpu")
+        self.previous_vae_dtype = StateTracker.get_vae_dtype()
+        StateTracker.set_vae_dtype(torch.float32)
+        self.vae_cache = VAECache(
+            id="foo",
+            vae=PassthroughVAE(),
+            accelerator=self.accelerator,
+            metadata_backend=self.metadata_backend,
+            instance_data_dir="/data",
+            image_data_backend=self.data_backend,
+            cache_dir="/cache",
+            vae_batch_size=4,
+            max_workers=2,
+            vae_cache_ondemand=True,
+        )
+
+    def tearDown(self):
+        self.vae_cache.close()
+        StateTracker.set_vae_dtype(self.previous_vae_dtype)
+
+    def _prepare_sample(self, image=None, data_backend_id=None, filepath=None):
+        if filepath == "/data/b.png":
+            raise ValueError("Simulated preparation failure")
+        return self.images[filepath], (0, 0), 1.0
+
+    def _expected_latent_value(self, filepath):
+        return self.levels[filepath] / 127.5 - 1.0
+
+    def test_dropped_sample_keeps_filepaths_aligned(self):
+        with patch("helpers.caching.vae.prepare_sample", self._prepare_sample):
+            output_values = self.vae_cache._process_images_in_batch(
+                list(self.images.keys()),
+                list(self.images.values()),
+                disable_queue=True,
+            )
+        self.assertEqual(len(output_values), 2)
+        for pixel_values, filepath, _, _ in output_values:
+            self.assertNotEqual(filepath, "/data/b.png")
+            self.assertTrue(torch.all(pixel_values == self.levels[filepath]))
+
+    def test_ondemand_latents_follow_caller_order(self):
+        filepaths = ["/data/a.png", "/data/c.png"]
+        # Reads complete out of order, as they can with as_completed.
+        self.vae_cache._read_from_storage_concurrently = (
+            lambda paths, hide_errors=False: (
+                (path, self.images[path]) for path in reversed(paths)
+            )
+        )
+        with patch("helpers.caching.vae.prepare_sample", self._prepare_sample):
+            latents = self.vae_cache.encode_images([None] * len(filepaths), filepaths)
+        self.assertEqual(len(latents), len(filepaths))
+        for filepath, latent in zip(filepaths, latents):
+            self.assertTrue(
+                torch.allclose(
+                    latent,
+                    torch.full_like(latent, self._expected_latent_value(filepath)),
+                )
+            )
+
+
+class TestVAECacheProcessBuckets(unittest.TestCase):
+    def setUp(self):
+        # Each bucket has its own image size, and each image a grey level that identifies it.
+        self.buckets = {
+            "1.0": [f"/data/square_{i}.png" for i in range(5)],
+            "2.0": [f"/data/wide_{i}.png" for i in range(3)],
+        }
+        self.bucket_by_filepath = {
+            filepath: bucket
+            for bucket, filepaths in self.buckets.items()
+            for filepath in filepaths
+        }
+        self.levels = {
+            filepath: 10 * (idx + 1)
+            for idx, filepath in enumerate(self.bucket_by_filepath)
+        }
+        self.images = {
+            filepath: Image.new(
+                "RGB",
+                (int(8 * float(bucket)), 8),
+                color=(self.levels[filepath],) * 3,
+            )
+            for filepath, bucket in self.bucket_by_filepath.items()
+        }
+        self.data_backend = MockDataBackend()
+        self.data_backend.id = "foo"
+        self.data_backend.type = "local"
+        self.data_backend.create_directory = Mock()
+        self.data_backend.write_batch = Mock()
+        self.data_backend.read_image_batch = (
+            lambda filepaths, delete_problematic_images=False: (
+                filepaths,
+                [self.images[filepath] for filepath in filepaths],
+            )
+        )
+        self.metadata_backend = MagicMock()
+        self.metadata_backend.image_metadata_loaded = True
+        self.metadata_backend.read_cache.return_value = {
+            bucket: list(filepaths) for bucket, filepaths in self.buckets.items()
+        }
+        self.previous_vae_dtype = StateTracker.get_vae_dtype()
+        StateTracker.set_vae_dtype(torch.float32)
+        self.vae_cache = VAECache(
+            id="foo",
+            vae=PassthroughVAE(),
+            accelerator=Mock(device="cpu"),
+            metadata_backend=self.metadata_backend,
+            instance_data_dir="/data",
+            image_data_backend=self.data_backend,
+            cache_dir="/cache",
+            write_batch_size=2,
+            read_batch_size=2,
+            process_queue_size=2,
+            vae_batch_size=2,
+            max_workers=4,
+        )
+        self.vae_cache.build_vae_cache_filename_map(list(self.bucket_by_filepath))
+        self.vae_cache.local_unprocessed_files = list(self.bucket_by_filepath)
+
+    def tearDown(self):
+        self.vae_cache.close()
+        StateTracker.set_vae_dtype(self.previous_vae_dtype)
+
+    def _prepare_sample(self, image=None, data_backend_id=None, filepath=None):
+        return (
+            self.images[filepath],
+            (0, 0),
+            float(self.bucket_by_filepath[filepath]),
+        )
+
+    def test_every_file_is_encoded_and_written_once(self):
+        encoded_batches = []
+        encode_images = self.vae_cache.encode_images
+
+        def recording_encode_images(images, filepaths, load_from_cache=True):
+            encoded_batches.append(list(filepaths))
+            return encode_images(images, filepaths, load_from_cache=load_from_cache)
+
+        self.vae_cache.encode_images = recording_encode_images
+        with patch("helpers.caching.vae.prepare_sample", self._prepare_sample), patch(
+            "helpers.training.state_tracker.StateTracker.get_vae_cache_files",
+            return_value={},
+        ):
+            self.vae_cache.process_buckets()
+
+        for batch in encoded_batches:
+            self.assertEqual(
+                len({self.bucket_by_filepath[filepath] for filepath in batch}), 1
+            )
+
+        written = {}
+        for call in self.data_backend.write_batch.call_args_list:
+            cache_paths, latents = call.args
+            for cache_path, latent in zip(cache_paths, latents):
+                self.assertNotIn(cache_path, written)
+                written[cache_path] = latent
+        expected_paths = {
+            self.vae_cache.image_path_to_vae_path[filepath]: filepath
+            for filepath in self.bucket_by_filepath
+        }
+        self.assertEqual(set(written), set(expected_paths))
+        for cache_path, filepath in expected_paths.items():
+            latent = written[cache_path]
+            self.assertTrue(
+                torch.allclose(
+                    latent,
+                    torch.full_like(latent, self.levels[filepath] / 127.5 - 1.0),
+                )
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
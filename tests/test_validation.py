@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import Mock, MagicMock, patch
+from helpers.training.validation import Validation
+from helpers.training.state_tracker import StateTracker
+
+
+class StubVAE:
+    def __init__(self):
+        self.device = "cpu"
+
+    def to(self, device, *args, **kwargs):
+        self.device = device
+        return self
+
+
+class StubPipeline:
+    from_pretrained_calls = 0
+
+    def __init__(self, vae=None, **kwargs):
+        self.vae = vae
+
+    @classmethod
+    def from_pretrained(cls, **kwargs):
+        cls.from_pretrained_calls += 1
+        return cls(vae=kwargs.get("vae"))
+
+    def to(self, device):
+        self.vae.to(device)
+        return self
+
+    def set_progress_bar_config(self, **kwargs):
+        pass
+
+
+class TestValidationPipelineReuse(unittest.TestCase):
+    def setUp(self):
+        self.previous_global_step = StateTracker.get_global_step()
+        StateTracker.set_global_step(2)
+        StubPipeline.from_pretrained_calls = 0
+        self.vae = StubVAE()
+        self.validation = Validation.__new__(Validation)
+        self.validation.accelerator = Mock(is_main_process=True, device="cuda")
+        self.validation.args = MagicMock(
+            use_ema=False,
+            keep_vae_loaded=False,
+            vae_cache_ondemand=False,
+            validation_torch_compile=False,
+            smoldit=False,
+            controlnet=False,
+            sd3=False,
+            validation_steps=1,
+            gradient_accumulation_steps=1,
+        )
+        self.validation.validation_prompts = ["a photo"]
+        self.validation.unet = MagicMock()
+        self.validation.transformer = None
+        self.validation.text_encoder_1 = None
+        self.validation.tokenizer_1 = None
+        self.validation.weight_dtype = None
+        self.validation.vae = self.vae
+        self.validation.pipeline = None
+
+    def tearDown(self):
+        StateTracker.set_global_step(self.previous_global_step)
+
+    def test_intermediary_validations_reuse_pipeline_and_offload_vae(self):
+        with patch.object(
+            Validation, "_pipeline_cls", return_value=StubPipeline
+        ), patch.object(Validation, "setup_scheduler"), patch.object(
+            Validation, "process_prompts"
+        ), patch(
+            "helpers.training.validation.unwrap_model",
+            side_effect=lambda accelerator, model: model,
+        ):
+            for step in (1, 2):
+                self.validation.run_validations(
+                    step=step, validation_type="intermediary"
+                )
+                self.assertIsNone(self.validation.vae)
+                self.assertEqual(self.vae.device, "cpu")
+        self.assertEqual(StubPipeline.from_pretrained_calls, 1)
+        self.assertIs(self.validation.pipeline.vae, self.vae)
+
+
+if __name__ == "__main__":
+    unittest.main()
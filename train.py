@@ -29,11 +29,15 @@ os.environ["ACCELERATE_LOG_LEVEL"] = "WARNING"
 from helpers import log_format  # noqa
 from helpers.arguments import parse_args
 from helpers.caching.memory import reclaim_memory
-from helpers.training.validation import Validation, prepare_validation_prompt_list
+from helpers.training.validation import (
+    Validation,
+    prepare_validation_prompt_list,
+    SCHEDULER_EXTRA_ARGS,
+)
 from helpers.training.state_tracker import StateTracker
 from helpers.data_backend.factory import BatchFetcher
 from helpers.training.deepspeed import deepspeed_zero_init_disabled_context_manager
-from helpers.training.wrappers import unwrap_model
+from helpers.training.wrappers import unwrap_model, enable_vae_memory_options
 from helpers.data_backend.factory import configure_multi_databackend
 from helpers.data_backend.factory import random_dataloader_iterator
 from helpers.training.custom_schedule import (
@@ -83,6 +87,7 @@ from diffusers import (
     EulerDiscreteScheduler,
     EulerAncestralDiscreteScheduler,
     UniPCMultistepScheduler,
+    DPMSolverMultistepScheduler,
 )
 
 from peft import LoraConfig
@@ -103,6 +108,7 @@ SCHEDULER_NAME_MAP = {
     "euler": EulerDiscreteScheduler,
     "euler-a": EulerAncestralDiscreteScheduler,
     "unipc": UniPCMultistepScheduler,
+    "dpm++": DPMSolverMultistepScheduler,
     "ddim": DDIMScheduler,
     "ddpm": DDPMScheduler,
 }
@@ -642,11 +648,19 @@ def main():
             elif args.vae_dtype == "fp32":
                 vae_dtype = torch.float32
             elif args.vae_dtype == "none" or args.vae_dtype == "default":
-                vae_dtype = torch.bfloat16
+                # Pre-Ampere GPUs have no bf16 tensor cores, and emulating it there is slower than fp32.
+                if (
+                    torch.cuda.is_available()
+                    and torch.cuda.get_device_capability()[0] < 8
+                ):
+                    vae_dtype = torch.float32
+                else:
+                    vae_dtype = torch.bfloat16
         logger.info(
             f"Loading VAE onto accelerator, converting from {vae.dtype} to {vae_dtype}"
         )
         vae.to(accelerator.device, dtype=vae_dtype)
+        enable_vae_memory_options(vae, args)
         StateTracker.set_vae_dtype(vae_dtype)
     StateTracker.set_vae(vae)
 
@@ -2473,6 +2487,11 @@ def main():
             )
             break
 
+    # Make sure any latents encoded on-demand during training have been written out.
+    for _, backend in StateTracker.get_data_backends().items():
+        if "vaecache" in backend:
+            backend["vaecache"].close()
+
     # Create the pipeline using the trained modules and save it.
     accelerator.wait_for_everyone()
     if accelerator.is_main_process:
@@ -2746,6 +2765,7 @@ def main():
                     prediction_type=args.prediction_type,
                     timestep_spacing=args.training_scheduler_timestep_spacing,
                     rescale_betas_zero_snr=args.rescale_betas_zero_snr,
+                    **SCHEDULER_EXTRA_ARGS.get(args.validation_noise_scheduler, {}),
                 )
             pipeline.save_pretrained(
                 os.path.join(args.output_dir, "pipeline"), safe_serialization=True